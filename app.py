@@ -1,12 +1,12 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import os
 from core.agent import (
     ValuationState, initial_state, extract_info_node, 
     ask_next_question_node, summary_confirmation_node, 
     process_confirmation_node, calculate_node, 
-    should_calculate, missing_slots
+    should_calculate, missing_slots, reset_asked
 )
-import datetime
 import time
 
 # Configure page
@@ -75,118 +75,6 @@ st.markdown("""
         50% { opacity: 0.5; }
     }
     
-    /* Chat container */
-    .chat-container {
-        background: white;
-        border-radius: 0 0 12px 12px;
-        max-height: 450px;
-        overflow-y: auto;
-        padding: 1rem;
-        box-shadow: 0 2px 10px rgba(0, 0, 0, 0.1);
-        margin-bottom: 1rem;
-    }
-    
-    /* Messages */
-    .message {
-        margin: 0.75rem 0;
-        animation: fadeIn 0.3s ease-in;
-    }
-    
-    @keyframes fadeIn {
-        from { opacity: 0; transform: translateY(10px); }
-        to { opacity: 1; transform: translateY(0); }
-    }
-    
-    .user-message {
-        background: linear-gradient(135deg, #0ea5e9 0%, #0284c7 100%);
-        color: white;
-        padding: 0.75rem 1rem;
-        border-radius: 18px 18px 4px 18px;
-        margin-left: auto;
-        max-width: 75%;
-        word-wrap: break-word;
-        box-shadow: 0 2px 8px rgba(14, 165, 233, 0.3);
-    }
-    
-    .bot-message {
-        background: #f1f5f9;
-        color: #334155;
-        padding: 0.75rem 1rem;
-        border-radius: 18px 18px 18px 4px;
-        margin-right: auto;
-        max-width: 75%;
-        word-wrap: break-word;
-        border-left: 3px solid #0ea5e9;
-        box-shadow: 0 2px 8px rgba(0, 0, 0, 0.05);
-    }
-    
-    .typing-indicator {
-        padding: 0.75rem 1rem;
-        border-radius: 18px 18px 18px 4px;
-        margin-right: auto;
-        max-width: 75%;
-        word-wrap: break-word;
-        border-left: 3px solid #0ea5e9;
-        box-shadow: 0 2px 8px rgba(0, 0, 0, 0.05);
-        display: flex;
-        align-items: center;
-        justify-content: space-between;
-    }
-    
-    .typing-dots {
-        display: flex;
-        gap: 0.25rem;
-    }
-    
-    .typing-dot {
-        width: 8px;
-        height: 8px;
-        background: #0ea5e9;
-        border-radius: 50%;
-        animation: typing 1.5s infinite;
-    }
-    
-    @keyframes typing {
-        0%, 100% { opacity: 0.5; }
-        50% { opacity: 1; }
-    }
-    
-    /* Input area */
-    .input-section {
-        background: white;
-        padding: 1rem;
-        border-radius: 12px;
-        box-shadow: 0 2px 10px rgba(0, 0, 0, 0.1);
-    }
-    
-    div[data-testid="stTextInput"] > div > div > input,
-    .stTextInput input,
-    input[type="text"] {
-        border-radius: 24px !important;
-        border: 2px solid #e2e8f0 !important;
-        padding: 0.75rem 1rem !important;
-        font-size: 0.95rem !important;
-        transition: all 0.2s ease !important;
-        background-color: #f8fafc !important;
-        color: #334155 !important;
-    }
-    
-    div[data-testid="stTextInput"] > div > div > input:focus,
-    .stTextInput input:focus,
-    input[type="text"]:focus {
-        border-color: #0ea5e9 !important;
-        box-shadow: 0 0 0 3px rgba(14, 165, 233, 0.1) !important;
-        outline: none !important;
-        background-color: white !important;
-    }
-    
-    div[data-testid="stTextInput"] > div > div > input::placeholder,
-    .stTextInput input::placeholder,
-    input[type="text"]::placeholder {
-        color: #94a3b8 !important;
-        font-style: italic !important;
-    }
-    
     div[data-testid="stButton"] > button,
     .stButton button,
     button[kind="primary"] {
@@ -225,25 +113,6 @@ st.markdown("""
         background: #475569 !important;
     }
     
-    /* Scrollbar */
-    .chat-container::-webkit-scrollbar {
-        width: 6px;
-    }
-    
-    .chat-container::-webkit-scrollbar-track {
-        background: #f1f5f9;
-        border-radius: 3px;
-    }
-    
-    .chat-container::-webkit-scrollbar-thumb {
-        background: #cbd5e1;
-        border-radius: 3px;
-    }
-    
-    .chat-container::-webkit-scrollbar-thumb:hover {
-        background: #94a3b8;
-    }
-    
     .copy-btn {
         background: none;
         border: none;
@@ -251,15 +120,20 @@ st.markdown("""
         margin-left: 0.5rem;
         cursor: pointer;
     }
-    
-    .message-timestamp {
-        font-size: 0.8rem;
-        color: #64748b;
-        margin-top: 0.25rem;
-    }
 </style>
 """, unsafe_allow_html=True)
 
+def add_message(role, content, timestamp=""):
+    """Append a chat message with a stable id and its pre-rendered HTML"""
+    st.session_state.msg_counter = st.session_state.get("msg_counter", 0) + 1
+    st.session_state.messages.append({
+        "id": f"msg_{st.session_state.msg_counter}",
+        "role": role,
+        "content": content,
+        "rendered": content.replace("\n", "<br>") if role == "assistant" else content,
+        "timestamp": timestamp,
+    })
+
 def initialize_session():
     """Initialize session state"""
     if "messages" not in st.session_state:
@@ -270,114 +144,111 @@ def initialize_session():
         st.session_state.agent_state = ask_next_question_node(st.session_state.agent_state)
         
         # Add initial bot message
-        if st.session_state.agent_state.get("messages"):
-            initial_msg = st.session_state.agent_state["messages"][-1]["content"]
-            st.session_state.messages.append({"role": "assistant", "content": initial_msg})
+        if st.session_state.agent_state.messages:
+            initial_msg = st.session_state.agent_state.messages[-1]["content"]
+            add_message("assistant", initial_msg)
 
 
 
-def display_messages():
-    """Display chat messages"""
-    for message in st.session_state.messages:
+# Copy-to-clipboard buttons for bot messages (injected once, not per message)
+COPY_BUTTON_SCRIPT = """
+<script>
+const doc = window.parent.document;
+function attachCopyButtons() {
+    doc.querySelectorAll("[data-message-id]").forEach((el) => {
+        if (el.dataset.copyReady) return;
+        el.dataset.copyReady = "1";
+        const btn = doc.createElement("button");
+        btn.className = "copy-btn";
+        btn.textContent = "📋";
+        btn.onclick = () => window.parent.navigator.clipboard.writeText(el.innerText);
+        el.after(btn);
+    });
+}
+attachCopyButtons();
+new MutationObserver(attachCopyButtons).observe(doc.body, {childList: true, subtree: true});
+</script>
+"""
+
+# Number of most recent messages rendered directly; older ones go in an expander
+WINDOW = 50
+
+def render_message(message):
+    """Render a single chat message"""
+    with st.chat_message(message["role"]):
         if message["role"] == "user":
-            timestamp = message.get("timestamp", "")
-            st.markdown(f'''
-            <div class="message">
-                <div class="user-message">
-                    {message["content"]}
-                    <div class="message-timestamp">{timestamp}</div>
-                </div>
-            </div>
-            ''', unsafe_allow_html=True)
+            st.markdown(message["content"])
         else:
-            content = message["content"].replace("\n", "<br>")
-            timestamp = message.get("timestamp", "")
-            message_id = f"msg_{hash(content)}"
-            st.markdown(f'''
-            <div class="message">
-                <div class="bot-message">
-                    <span id="{message_id}">{content}</span>
-                    <button class="copy-btn" onclick="copyToClipboard('{message_id}')">📋</button>
-                    <div class="message-timestamp">{timestamp}</div>
-                </div>
-            </div>
-            ''', unsafe_allow_html=True)
-            
-            # Add the JavaScript for copy functionality
-            st.markdown('''
-            <script>
-            function copyToClipboard(messageId) {
-                const text = document.querySelector(`#${messageId}`).innerText;
-                navigator.clipboard.writeText(text);
-            }
-            </script>
-            ''', unsafe_allow_html=True)
+            st.markdown(f'<span data-message-id="{message["id"]}">{message["rendered"]}</span>', unsafe_allow_html=True)
+        timestamp = message.get("timestamp", "")
+        if timestamp:
+            st.caption(timestamp)
 
-def show_typing_indicator():
-    """Show typing indicator"""
-    st.markdown('''
-    <div class="message">
-        <div class="typing-indicator">
-            <span>Assistant is typing</span>
-            <div class="typing-dots">
-                <div class="typing-dot"></div>
-                <div class="typing-dot"></div>
-                <div class="typing-dot"></div>
-            </div>
-        </div>
-    </div>
-    ''', unsafe_allow_html=True)
+def display_messages():
+    """Display chat messages"""
+    msgs = st.session_state.messages
+    head, tail = msgs[:-WINDOW], msgs[-WINDOW:]
+    
+    # Expander children are sent even while collapsed, so earlier messages
+    # are only rendered once the user switches them on
+    if head and st.toggle(f"Show {len(head)} earlier messages", key="show_earlier_messages"):
+        for message in head:
+            render_message(message)
+    
+    for message in tail:
+        render_message(message)
+
+    components.html(COPY_BUTTON_SCRIPT, height=0)
 
 def process_input(user_input):
     """Process user input through the agent"""
-    # Add user message with timestamp
-    timestamp = datetime.datetime.now().strftime("%H:%M")
-    st.session_state.messages.append({"role": "user", "content": user_input, "timestamp": timestamp})
-    st.session_state.agent_state["messages"].append({"role": "user", "content": user_input})
-    
-    # Show typing indicator
-    typing_placeholder = st.empty()
-    with typing_placeholder.container():
-        show_typing_indicator()
-    
-    # Small delay for UX
-    time.sleep(0.5)
-    
-    # Process through agent
-    if "_confirmation" in st.session_state.agent_state.get("asked", []):
-        st.session_state.agent_state = process_confirmation_node(st.session_state.agent_state)
+    # One timestamp for both the user message and the bot reply
+    timestamp = time.strftime("%H:%M")
+    add_message("user", user_input, timestamp)
+    render_message(st.session_state.messages[-1])
+    # Bind the agent state locally; nodes mutate and return the same ValuationState
+    agent = st.session_state.agent_state
+    agent.messages.append({"role": "user", "content": user_input})
+    
+    # Placeholder so the reply replaces the spinner in place (no full rerun)
+    reply = st.empty()
+    with reply.container(), st.chat_message("assistant"), st.spinner("Thinking..."):
+        # Process through agent
+        if should_calculate(agent) == "CONFIRM_PENDING":
+            agent = process_confirmation_node(agent)
+            slots = agent.slots
         
-        if st.session_state.agent_state["slots"].get("_confirmed", False):
-            st.session_state.agent_state = calculate_node(st.session_state.agent_state)
-            st.session_state.agent_state["asked"] = []
-            st.session_state.agent_state["slots"]["_confirmed"] = False
-        elif st.session_state.agent_state["slots"].get("_confirmed") == False:
-            # Reset and start over
-            st.session_state.agent_state["asked"] = []
-            st.session_state.agent_state["slots"]["_confirmed"] = None
-            remaining = missing_slots(st.session_state.agent_state.get("slots", {}))
-            if remaining:
-                st.session_state.agent_state = ask_next_question_node(st.session_state.agent_state)
-    else:
-        st.session_state.agent_state = extract_info_node(st.session_state.agent_state)
-        result = should_calculate(st.session_state.agent_state)
+            if slots.get("_confirmed", False):
+                agent = calculate_node(agent)
+                reset_asked(agent)
+                slots["_confirmed"] = False
+            elif slots.get("_confirmed") == False:
+                # Reset and start over
+                reset_asked(agent)
+                slots["_confirmed"] = None
+                if missing_slots(slots):
+                    agent = ask_next_question_node(agent)
+        else:
+            agent = extract_info_node(agent)
+            result = should_calculate(agent)
         
-        if result == "ASK":
-            st.session_state.agent_state = ask_next_question_node(st.session_state.agent_state)
-        elif result == "CONFIRM":
-            st.session_state.agent_state = summary_confirmation_node(st.session_state.agent_state)
-        elif result == "CALC":
-            st.session_state.agent_state = calculate_node(st.session_state.agent_state)
-            st.session_state.agent_state["asked"] = []
-    
-    # Clear typing indicator
-    typing_placeholder.empty()
+            if result == "ASK":
+                agent = ask_next_question_node(agent)
+            elif result == "CONFIRM":
+                agent = summary_confirmation_node(agent)
+            elif result == "CALC":
+                agent = calculate_node(agent)
+                reset_asked(agent)
+    st.session_state.agent_state = agent
     
     # Add bot response with timestamp
-    if st.session_state.agent_state.get("messages"):
-        bot_response = st.session_state.agent_state["messages"][-1]["content"]
-        timestamp = datetime.datetime.now().strftime("%H:%M")
-        st.session_state.messages.append({"role": "assistant", "content": bot_response, "timestamp": timestamp})
+    if agent.messages:
+        bot_response = agent.messages[-1]["content"]
+        add_message("assistant", bot_response, timestamp)
+        with reply.container():
+            render_message(st.session_state.messages[-1])
+    else:
+        reply.empty()
 
 def reset_chat():
     """Reset the chat session"""
@@ -385,13 +256,18 @@ def reset_chat():
     st.session_state.agent_state = initial_state()
     st.session_state.agent_state = ask_next_question_node(st.session_state.agent_state)
     
-    if st.session_state.agent_state.get("messages"):
-        initial_msg = st.session_state.agent_state["messages"][-1]["content"]
-        st.session_state.messages.append({"role": "assistant", "content": initial_msg})
+    if st.session_state.agent_state.messages:
+        initial_msg = st.session_state.agent_state.messages[-1]["content"]
+        add_message("assistant", initial_msg)
+
+@st.cache_resource
+def has_api_key():
+    """Check for the API key once per process rather than on every rerun"""
+    return bool(os.getenv("GOOGLE_API_KEY"))
 
 def main():
     # Check API key
-    if not os.getenv("GOOGLE_API_KEY"):
+    if not has_api_key():
         st.error("🔑 Please set your GOOGLE_API_KEY environment variable")
         st.stop()
     
@@ -410,29 +286,12 @@ def main():
     """, unsafe_allow_html=True)
     
     # Chat area
-    st.markdown('<div class="chat-container">', unsafe_allow_html=True)
     display_messages()
-    st.markdown('</div>', unsafe_allow_html=True)
     
     # Input section
-    st.markdown('<div class="input-section">', unsafe_allow_html=True)
-    
-    with st.form("chat_form", clear_on_submit=True):
-        col1, col2 = st.columns([4, 1])
-        
-        with col1:
-            user_input = st.text_input(
-                "Message",
-                placeholder="Type your response here...",
-                label_visibility="collapsed"
-            )
-        
-        with col2:
-            send_clicked = st.form_submit_button("Send", use_container_width=True)
-        
-        if send_clicked and user_input.strip():
-            process_input(user_input.strip())
-            st.rerun()
+    prompt = st.chat_input("Type your response here...")
+    if prompt and prompt.strip():
+        process_input(prompt.strip())
     
     # Reset button
     st.markdown('<div class="reset-btn">', unsafe_allow_html=True)
@@ -440,8 +299,6 @@ def main():
         reset_chat()
         st.rerun()
     st.markdown('</div>', unsafe_allow_html=True)
-    
-    st.markdown('</div>', unsafe_allow_html=True)
 
 if __name__ == "__main__":
     main()
@@ -1,28 +1,50 @@
 from __future__ import annotations
 
-import json
+import bisect
+import functools
+import math
 import os
-from typing import Dict, List, TypedDict, Optional, Tuple
+import re
+from array import array
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import MappingProxyType
+from typing import Deque, Dict, List, Mapping, Optional, Set, Tuple
 
 from dotenv import load_dotenv
-from langchain.chat_models import init_chat_model
-from langgraph.graph import StateGraph, START, END
 
 from core.tools import property_valuation_tool
 
+try:
+    from orjson import loads as _json_loads
+except ImportError:  # stdlib json also accepts bytes
+    from json import loads as _json_loads
+
 load_dotenv()
 
 # ------------------------------
 # 1) Model
 # ------------------------------
-llm = init_chat_model("google_genai:gemini-2.0-flash")
+@functools.cache
+def get_llm():
+    # Imported and built on first use so importing the agent stays light
+    from langchain.chat_models import init_chat_model
+    return init_chat_model("google_genai:gemini-2.0-flash")
+
+
+def __getattr__(name: str):
+    # Keep `from core.agent import llm` working without an eager client
+    if name == "llm":
+        return get_llm()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # ------------------------------
 # 2) Static option sets + friendly hints
 # ------------------------------
-VALID_COLLATERAL_TYPES = ["House", "Car"]
+VALID_COLLATERAL_TYPES = ("House", "Car")
 
-VALID_CATEGORIES = [
+VALID_CATEGORIES = (
     "Higher Villa",
     "Multi-Story Building",
     "Apartment / Condominium",
@@ -30,11 +52,11 @@ VALID_CATEGORIES = [
     "Fuel Station",
     "Coffee Washing Site",
     "Green House",
-]
+)
 
-VALID_USE = ["Residential", "Commercial"]
+VALID_USE = ("Residential", "Commercial")
 
-VALID_TOWN_CLASSES = [
+VALID_TOWN_CLASSES = (
     "Finfinne Border A1",
     "Surrounding Finfine B1",
     "Surrounding Finfine B2",
@@ -45,7 +67,7 @@ VALID_TOWN_CLASSES = [
     "Secondary Major Cities D2",
     "Tertiary Towns E1",
     "Tertiary Towns E2",
-]
+)
 
 TOWN_CLASS_EXAMPLES = {
     "Finfinne Border A1": "Houses near the edge of Finfinne city, close to main roads",
@@ -75,26 +97,30 @@ MATERIAL_EXAMPLES = {
 DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
 
 
+@functools.cache
 def _load_json(filename: str) -> dict:
-    path = os.path.join(DATA_DIR, filename)
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return _json_loads(Path(DATA_DIR, filename).read_bytes())
+
 
+# Read-only views: the parsed data is shared and must not be mutated
+PLOT_PRICES = MappingProxyType(_load_json("location_data.json"))
+MATERIAL_MAPPINGS = MappingProxyType(_load_json("material_mappings.json"))
 
-PLOT_PRICES = _load_json("location_data.json")
-MATERIAL_MAPPINGS = _load_json("material_mappings.json")
+
+_DEFAULT_COMPONENTS: Tuple[str, ...] = ("foundation", "roof", "floor", "ceiling", "metal work", "sanitary")
+_CATEGORY_COMPONENTS: Dict[str, Tuple[str, ...]] = {
+    cat: tuple(cat_map) for cat, cat_map in MATERIAL_MAPPINGS.items() if cat_map
+}
 
 
-def get_material_components_for_category(category: str) -> List[str]:
-    cat_map = MATERIAL_MAPPINGS.get(category, {})
-    comps = list(cat_map.keys())
-    return comps if comps else ["foundation", "roof", "floor", "ceiling", "metal work", "sanitary"]
+def get_material_components_for_category(category: str) -> Tuple[str, ...]:
+    return _CATEGORY_COMPONENTS.get(category, _DEFAULT_COMPONENTS)
 
 
 # ------------------------------
 # 4) Slots configuration
 # ------------------------------
-BASE_REQUIRED_SLOTS_IN_ORDER: List[str] = [
+BASE_REQUIRED_SLOTS_IN_ORDER: Tuple[str, ...] = (
     "collateral_type",  # First question: House or Car
     "building_category",
     "prop_town",
@@ -110,13 +136,18 @@ BASE_REQUIRED_SLOTS_IN_ORDER: List[str] = [
     "elevator_stops",
     "mcf",
     "pef",
-]
+)
 
 SPECIAL_CATEGORY_BASE_SLOTS: List[str] = [
     "prop_town"  # Only property location is required for special categories
 ]
 
-SPECIAL_CATEGORIES = ["Fuel Station", "Coffee Washing Site", "Green House"]
+SPECIAL_CATEGORIES = frozenset({"Fuel Station", "Coffee Washing Site", "Green House"})
+
+# Floor/elevator questions, plus the section questions only Multi-Story Buildings ask
+_FLOOR_SLOTS = frozenset({"num_floors", "has_elevator", "elevator_stops"})
+_SECTION_FLOOR_SLOTS = _FLOOR_SLOTS | {"num_sections", "section_dimensions"}
+_NO_SECTION_CATEGORIES = frozenset({"Higher Villa", "Apartment / Condominium", "MPH & Factory Building"})
 
 CATEGORY_SPECIAL_SLOTS: Dict[str, List[str]] = {
     "Higher Villa": [],
@@ -130,7 +161,12 @@ CATEGORY_SPECIAL_SLOTS: Dict[str, List[str]] = {
     "Green House": ["greenhouse_area", "in_farm_road_km", "borehole_depth", "land_preparation_area"],
 }
 
-SPECIAL_SLOT_EXAMPLES: Dict[str, str] = {
+# Everything a special category may ask, for O(1) membership checks
+_SPECIAL_CATEGORY_SLOT_SETS: Dict[str, frozenset] = {
+    cat: frozenset(SPECIAL_CATEGORY_BASE_SLOTS + CATEGORY_SPECIAL_SLOTS[cat]) for cat in SPECIAL_CATEGORIES
+}
+
+SPECIAL_SLOT_EXAMPLES: Mapping[str, str] = MappingProxyType({
     "height_meters": "e.g., 3.5 (in meters, will determine if <=4m or >4m category applies)",
     "has_basement": "e.g., yes/no (whether the building has a basement)",
     "site_preparation_area": "e.g., 1500 (sqm)",
@@ -147,33 +183,162 @@ SPECIAL_SLOT_EXAMPLES: Dict[str, str] = {
     "in_farm_road_km": "e.g., 1.2 (km)",
     "borehole_depth": "e.g., 80 (meters)",
     "land_preparation_area": "e.g., 8000 (sqm)",
+})
+
+OPTIONS_MAP: Mapping[str, Tuple[str, ...]] = MappingProxyType({
+    "building_category": VALID_CATEGORIES,
+    "gen_use": VALID_USE,
+    "prop_town": VALID_TOWN_CLASSES,
+})
+
+LABEL_MAP: Mapping[str, str] = MappingProxyType({
+    "building_name": "building name",
+    "num_floors": "number of floors",
+    "has_basement": "Does the building have a basement?",
+    "is_under_construction": "Is the building under construction?",
+    "incomplete_components": "List incomplete components",
+    "plot_area_sqm": "plot area (sqm)",
+    "mcf": "Market Condition Factor (MCF)",
+    "pef": "Property Enhancement Factor (PEF)",
+    "has_elevator": "Is there an elevator?",
+    "elevator_stops": "How many elevator stops?",
+    "num_sections": "How many sections does the building have?",
+})
+
+BOOLEAN_SLOTS = frozenset({"has_basement", "is_under_construction", "has_elevator"})
+
+# Special-slot values are coerced with these when building the payload
+_SPECIAL_SLOT_CTOR: Dict[str, type] = {
+    key: int if key.startswith("num_") else float
+    for keys in CATEGORY_SPECIAL_SLOTS.values()
+    for key in keys
 }
+# Slots parsed as numbers when answered (special-slot counts are integers)
+NUMERIC_SLOTS: Mapping[str, type] = MappingProxyType({
+    "plot_area_sqm": float,
+    "length": float,
+    "width": float,
+    "num_floors": int,
+    "elevator_stops": int,
+    "mcf": float,
+    "pef": float,
+    **{key: ctor for key, ctor in _SPECIAL_SLOT_CTOR.items() if key not in BOOLEAN_SLOTS},
+})
+
+GENERIC_EXAMPLES: Mapping[str, str] = MappingProxyType({
+    "building_name": "e.g., Villa Sunshine",
+    "num_floors": "e.g., 3",
+    "incomplete_components": "e.g., Foundation, Roof (or leave empty)",
+    "plot_area_sqm": "e.g., 450",
+    "mcf": "Reply 1.0 if unsure",
+    "pef": "Reply 1.0 if unsure",
+    "elevator_stops": "e.g., 5",
+})
 
 
 # ------------------------------
 # 5) Conversation state
 # ------------------------------
-class ValuationState(TypedDict):
-    messages: List[Dict]
-    slots: Dict[str, object]
-    asked: List[str]
+# Nodes only ever read the latest message (the UI keeps its own transcript),
+# so the agent history is a bounded tail instead of an ever-growing list
+MESSAGE_HISTORY_LIMIT = 32
+
+
+@dataclass(slots=True)
+class ValuationState:
+    messages: Deque[Dict] = field(default_factory=lambda: deque(maxlen=MESSAGE_HISTORY_LIMIT))
+    slots: Dict[str, object] = field(default_factory=dict)
+    asked: List[str] = field(default_factory=list)
+    asked_set: Set[str] = field(default_factory=set)
+    # Validation message shown ahead of the next question, since the UI only
+    # displays the latest assistant message
+    retry_hint: Optional[str] = None
 
 
 def initial_state() -> ValuationState:
-    return {"messages": [], "slots": {}, "asked": []}
+    return ValuationState()
+
 
+# "asked" keeps the order (the last entry is the pending question) while
+# "asked_set" answers membership checks without rebuilding a set each turn
+def _mark_asked(state: ValuationState, *slot_names: str) -> None:
+    for name in slot_names:
+        state.asked.append(name)
+        state.asked_set.add(name)
 
-def _boolify(text: str) -> Optional[bool]:
-    t = text.strip().lower()
-    # Handle common typos and variations
-    if t in {"yes", "y", "true", "t", "1", "ye", "yea", "yep", "ok", "okay", "sure"}:
+
+def _unmark_asked(state: ValuationState, slot_name: str) -> None:
+    state.asked.remove(slot_name)
+    if slot_name not in state.asked:
+        state.asked_set.discard(slot_name)
+
+
+def reset_asked(state: ValuationState, slot_names=()) -> None:
+    state.asked = list(slot_names)
+    state.asked_set = set(state.asked)
+
+
+# Accepted yes/no replies, including common typos and variations
+_TRUE_TOKENS = frozenset({"yes", "y", "true", "t", "1", "ye", "yea", "yep", "ok", "okay", "sure"})
+_FALSE_TOKENS = frozenset({"no", "n", "false", "f", "0", "nah", "nope", "not", "mo", "mo]", "nop"})
+
+
+def _boolify(t: str) -> Optional[bool]:
+    # Expects a reply that is already stripped and lowercased
+    if t in _TRUE_TOKENS:
         return True
-    if t in {"no", "n", "false", "f", "0", "nah", "nope", "not", "mo", "mo]", "nop"}:
+    if t in _FALSE_TOKENS:
         return False
     return None
 
 
-def format_choices_with_examples(choices: List[str], examples_map: Dict[str, str]) -> str:
+# A number such as "450", "1,200" or ".9"; commas only count as thousands
+# separators. A whole reply is matched with fullmatch, an embedded one
+# ("450 sqm", "about 3.5") with finditer
+_NUMBER_RE = re.compile(r"\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d*\.\d+|\d+")
+
+
+def _parse_number(ctor: type, text: str):
+    # Plain numbers convert directly; otherwise pull the single number out of
+    # the text. Negative, non-finite and ambiguous ("between 100 and 200",
+    # "1,5") replies raise ValueError so the question is asked again
+    match = _NUMBER_RE.fullmatch(text)
+    if match is None:
+        matches = list(_NUMBER_RE.finditer(text))
+        if len(matches) != 1:
+            raise ValueError(f"expected a single number, got {text!r}")
+        # A minus sign or a stray comma makes the reply ambiguous
+        match = matches[0]
+        start, end = match.span()
+        if (start and text[start - 1] == "-") or "," in text[:start] or "," in text[end:]:
+            raise ValueError(f"expected a non-negative number, got {text!r}")
+    value = ctor(match.group().replace(",", ""))
+    if not math.isfinite(value):
+        raise ValueError(f"expected a finite number, got {text!r}")
+    return value
+
+
+def _try_float(text: str) -> Optional[float]:
+    try:
+        return _parse_number(float, text)
+    except ValueError:
+        return None
+
+
+def _format_number(value) -> str:
+    # Whole floats print without the trailing ".0" (450.0 -> "450")
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+@functools.lru_cache(maxsize=None)
+def _choice_index(choices: Tuple[str, ...]) -> Dict[str, str]:
+    # Lower-cased option text -> canonical option, built once per choice set
+    return {c.lower(): c for c in choices}
+
+
+def format_choices_with_examples(choices: Tuple[str, ...], examples_map: Dict[str, str]) -> str:
     lines = []
     for i, c in enumerate(choices, start=1):
         ex = examples_map.get(c)
@@ -184,13 +349,10 @@ def format_choices_with_examples(choices: List[str], examples_map: Dict[str, str
     return "\n".join(lines)
 
 
-def current_required_slots(slots: Dict[str, object]) -> List[str]:
-    # If collateral type is Car, no other questions needed
-    if slots.get("collateral_type", "").lower() == "car":
-        return []
-        
-    cat = slots.get("building_category")
-    if isinstance(cat, str) and cat in SPECIAL_CATEGORIES:
+@functools.lru_cache(maxsize=16)
+def _required_slots_for_category(cat: Optional[str]) -> Tuple[str, ...]:
+    # The required slots depend only on the category, so build each list once
+    if cat in SPECIAL_CATEGORIES:
         req = list(SPECIAL_CATEGORY_BASE_SLOTS)
         # Add only the special slots for special categories
         for sp in CATEGORY_SPECIAL_SLOTS.get(cat, []):
@@ -206,7 +368,7 @@ def current_required_slots(slots: Dict[str, object]) -> List[str]:
         # Handle different building types
         if cat == "Higher Villa":
             # Higher Villa: Simple building, no sections, no floors
-            req = [s for s in req if s not in {"num_floors", "has_elevator", "elevator_stops"}]
+            req = [s for s in req if s not in _FLOOR_SLOTS]
             
         elif cat == "Multi-Story Building":
             # Multi-Story Building: use sections instead of base length/width
@@ -221,13 +383,12 @@ def current_required_slots(slots: Dict[str, object]) -> List[str]:
         elif cat == "MPH & Factory Building":
             # MPH & Factory: Remove length/width, add special slots
             req = [s for s in req if s not in {"length", "width", "gen_use"}]
-            slots["gen_use"] = "Commercial"  # Auto-set to Commercial
             # Add special slots for MPH & Factory Building
             for sp in CATEGORY_SPECIAL_SLOTS.get(cat, []):
                 req.append(sp)
         else:
             # Default: Remove floors and elevators for other building types
-            req = [s for s in req if s not in {"num_floors", "has_elevator", "elevator_stops"}]
+            req = [s for s in req if s not in _FLOOR_SLOTS]
             
         # Add material components for non-special categories
         if cat:
@@ -240,100 +401,145 @@ def current_required_slots(slots: Dict[str, object]) -> List[str]:
         if r not in seen:
             final.append(r)
             seen.add(r)
-    return final
+    return tuple(final)
 
 
-def missing_slots(slots: Dict[str, object]) -> List[str]:
-    # If collateral type is Car, no slots needed
+# Warm the cache for every category (and "not chosen yet") at import
+for _cat in (None, *VALID_CATEGORIES):
+    _required_slots_for_category(_cat)
+del _cat
+
+
+def current_required_slots(slots: Dict[str, object]) -> Tuple[str, ...]:
+    # If collateral type is Car, no other questions needed
     if slots.get("collateral_type", "").lower() == "car":
-        return []
-    
-    needed = [s for s in current_required_slots(slots) if s not in slots]
-    
-    cat = slots.get("building_category")
-    
-    # Handle different building types
-    if cat == "Higher Villa":
-        # Higher Villa: No sections, no floors
-        needed = [s for s in needed if s not in {"num_sections", "section_dimensions", "num_floors", "has_elevator", "elevator_stops"}]
+        return ()
         
-    elif cat == "Multi-Story Building":
-        # Multi-Story Building: Keep sections and floors
-        # Only process section_dimensions if we're in the middle of collecting them
-        if "section_dimensions" in needed and "section_index" in slots and slots["section_index"] < int(slots.get("num_sections", 1)):
-            needed.remove("section_dimensions")
-            
-    elif cat == "Apartment / Condominium":
-        # Apartment/Condominium: No sections, no floors
-        needed = [s for s in needed if s not in {"num_sections", "section_dimensions", "num_floors", "has_elevator", "elevator_stops"}]
-        
-    elif cat == "MPH & Factory Building":
-        # MPH & Factory: No sections, has special slots
-        needed = [s for s in needed if s not in {"num_sections", "section_dimensions", "num_floors", "has_elevator", "elevator_stops"}]
+    cat = slots.get("building_category")
+    if cat == "MPH & Factory Building":
+        slots["gen_use"] = "Commercial"  # Auto-set to Commercial
+    return _required_slots_for_category(cat)
 
-    # Handle conditional fields
-    if "has_elevator" in slots and not slots["has_elevator"]:
-        needed = [s for s in needed if s != "elevator_stops"]
-    if "is_under_construction" in slots and not slots["is_under_construction"]:
-        needed = [s for s in needed if s != "incomplete_components"]
 
-    return needed
+def _iter_missing_slots(slots: Dict[str, object], asked=()):
+    # Required slots still to fill, in order, with every skip rule in one pass
+    required = current_required_slots(slots)
+    if not required:
+        # Car collateral: nothing to ask
+        return
+    cat = slots.get("building_category")
+    # Higher Villa, Apartment / Condominium and MPH & Factory: no sections, no floors
+    skip_sections = cat in _NO_SECTION_CATEGORIES
+    # Multi-Story Building: section_dimensions is handled while sections are being collected
+    collecting_sections = (cat == "Multi-Story Building" and "section_index" in slots
+                           and slots["section_index"] < int(slots.get("num_sections", 1)))
+    # Conditional fields
+    skip_stops = "has_elevator" in slots and not slots["has_elevator"]
+    skip_incomplete = "is_under_construction" in slots and not slots["is_under_construction"]
+
+    for s in required:
+        if s in slots or s in asked:
+            continue
+        if skip_sections and s in _SECTION_FLOOR_SLOTS:
+            continue
+        if collecting_sections and s == "section_dimensions":
+            continue
+        if skip_stops and s == "elevator_stops":
+            continue
+        if skip_incomplete and s == "incomplete_components":
+            continue
+        yield s
 
 
-def ask_next_question_node(state: ValuationState) -> ValuationState:
-    slots = state.get("slots", {})
-    asked = set(state.get("asked", []))
-    remaining = [s for s in missing_slots(slots) if s not in asked]
-    
+def missing_slots(slots: Dict[str, object]) -> List[str]:
+    return list(_iter_missing_slots(slots))
+
+
+def _next_missing_slot(slots: Dict[str, object], asked: Set[str]) -> Optional[str]:
+    # Stops at the first slot that is neither answered nor already asked
+    return next(_iter_missing_slots(slots, asked), None)
+
+
+def _build_choice_questions() -> Dict[str, str]:
+    questions = {}
+    for s, choices in OPTIONS_MAP.items():
+        if s == "prop_town":
+            body = format_choices_with_examples(choices, TOWN_CLASS_EXAMPLES)
+        else:
+            body = "\n".join(f"{i + 1}. {c}" for i, c in enumerate(choices))
+        questions[s] = f"Please select {s.replace('_', ' ')}:\n{body}\n(Reply with the number)"
+    return questions
+
+
+def _build_slot_questions() -> Dict[str, str]:
+    questions = {}
+    for s, label in LABEL_MAP.items():
+        ex = GENERIC_EXAMPLES.get(s)
+        if s in BOOLEAN_SLOTS:
+            questions[s] = f"{label} (yes/no)"
+        else:
+            questions[s] = f"Enter {label}{f' ({ex})' if ex else ''}:"
+    # Special-slot prompts take precedence (e.g. has_basement for MPH & Factory)
+    for s, ex in SPECIAL_SLOT_EXAMPLES.items():
+        questions[s] = f"Enter {s.replace('_', ' ')} ({ex}):"
+    return questions
+
+
+def _build_material_questions() -> Dict[str, Tuple[str, Tuple[str, ...]]]:
+    # material__<comp> slot -> (question, options) for every category's components
+    questions = {}
+    for cat in (None, *VALID_CATEGORIES):
+        for s in _required_slots_for_category(cat):
+            if s.startswith("material__") and s not in questions:
+                comp = s.split("__", 1)[1]
+                options = tuple(MATERIAL_EXAMPLES.get(comp.lower(), "Reinforced concrete; Stone; Mud block").split("; "))
+                body = "\n".join(f"{i + 1}. {option}" for i, option in enumerate(options))
+                questions[s] = (f"Select material for {comp}:\n{body}\n(Reply with the number)", options)
+    return questions
+
+
+# Static question text, rendered once at import
+CHOICE_QUESTIONS = _build_choice_questions()
+SLOT_QUESTIONS = _build_slot_questions()
+MATERIAL_QUESTIONS = _build_material_questions()
+
+# Every numbered-choice slot -> (question, options), so dispatch is one lookup
+CHOICE_PROMPTS: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    **{s: (CHOICE_QUESTIONS[s], choices) for s, choices in OPTIONS_MAP.items()},
+    **MATERIAL_QUESTIONS,
+}
 
-    # Get building category
+
+def ask_next_question_node(state: ValuationState) -> ValuationState:
+    slots = state.slots
     cat = slots.get("building_category")
-    
-    # Handle different building types
-    if cat == "Higher Villa":
-        # Higher Villa: No sections, no floors
-        remaining = [s for s in remaining if s not in {"num_sections", "section_dimensions", "num_floors", "has_elevator", "elevator_stops"}]
-        
-    elif cat == "Multi-Story Building":
-        # Multi-Story Building: Keep sections and floors
-        pass  # Don't filter anything
-        
-    elif cat == "Apartment / Condominium":
-        # Apartment/Condominium: No sections, no floors
-        remaining = [s for s in remaining if s not in {"num_sections", "section_dimensions", "num_floors", "has_elevator", "elevator_stops"}]
-        
-    elif cat == "MPH & Factory Building":
-        # MPH & Factory: No sections, has special slots
-        remaining = [s for s in remaining if s not in {"num_sections", "section_dimensions", "num_floors", "has_elevator", "elevator_stops"}]
-    
+    next_slot = _next_missing_slot(slots, state.asked_set)
+
     # Handle collateral type selection
-    if "collateral_type" in remaining and "collateral_type" not in asked:
+    if next_slot == "collateral_type":
         question = "Select collateral type (House or Car):"
-        state["messages"].append({"role": "assistant", "content": question})
-        state.setdefault("asked", []).append("collateral_type")
+        state.messages.append({"role": "assistant", "content": question})
+        _mark_asked(state, "collateral_type")
         return state
         
     # If Car is selected, show pending message and end the flow
     if slots.get("collateral_type", "").lower() == "car":
-        state["messages"].append({"role": "assistant", 
+        state.messages.append({"role": "assistant", 
                                 "content": "🚗 Car collateral valuation is currently in development. Please check back later!"})
         # Mark all slots as asked to prevent further questions
-        state["asked"] = list(current_required_slots(slots))
+        reset_asked(state, current_required_slots(slots))
         return state
 
     # Handle the case where we're in the middle of collecting section dimensions (only for Multi-Story Building)
     if cat == "Multi-Story Building" and "section_index" in slots and slots["section_index"] < int(slots.get("num_sections", 1)):
         s = "section_dimensions"
-    elif not remaining:
+    elif next_slot is None:
         return state
     else:
-        s = remaining[0] if remaining else None
-
-    if s is None:
-        return state
+        s = next_slot
 
     # For special categories, skip directly to their special slots after basic info
-    if isinstance(cat, str) and cat in SPECIAL_CATEGORIES and s not in SPECIAL_CATEGORY_BASE_SLOTS + CATEGORY_SPECIAL_SLOTS.get(cat, []):
+    if cat in SPECIAL_CATEGORIES and s not in _SPECIAL_CATEGORY_SLOT_SETS[cat]:
         next_special = next((slot for slot in CATEGORY_SPECIAL_SLOTS.get(cat, []) if slot not in slots), None)
         if next_special:
             s = next_special
@@ -342,76 +548,29 @@ def ask_next_question_node(state: ValuationState) -> ValuationState:
     if cat == "MPH & Factory Building" and "height_meters" not in slots and s.startswith("material__"):
         s = "height_meters"
 
-    options_map = {
-        "building_category": VALID_CATEGORIES,
-        "gen_use": VALID_USE,
-        "prop_town": VALID_TOWN_CLASSES,
-    }
-
-    label_map = {
-        "building_name": "building name",
-        "num_floors": "number of floors",
-        "has_basement": "Does the building have a basement?",
-        "is_under_construction": "Is the building under construction?",
-        "incomplete_components": "List incomplete components",
-        "plot_area_sqm": "plot area (sqm)",
-        "mcf": "Market Condition Factor (MCF)",
-        "pef": "Property Enhancement Factor (PEF)",
-        "has_elevator": "Is there an elevator?",
-        "elevator_stops": "How many elevator stops?",
-        "num_sections": "How many sections does the building have?",
-    }
-
-    generic_examples = {
-        "building_name": "e.g., Villa Sunshine",
-        "num_floors": "e.g., 3",
-        "incomplete_components": "e.g., Foundation, Roof (or leave empty)",
-        "plot_area_sqm": "e.g., 450",
-        "mcf": "Reply 1.0 if unsure",
-        "pef": "Reply 1.0 if unsure",
-        "elevator_stops": "e.g., 5",
-    }
-
-    if s in options_map:
-        choices = options_map[s]
-        if s == "prop_town":
-            body = format_choices_with_examples(choices, TOWN_CLASS_EXAMPLES)
-        else:
-            body = "\n".join(f"{i + 1}. {c}" for i, c in enumerate(choices))
-        q = f"Please select {s.replace('_', ' ')}:\n{body}\n(Reply with the number)"
-        state["slots"]["__expected_choices__"] = (s, choices)
-    elif s.startswith("material__"):
-        comp = s.split("__", 1)[1]
-        material_options = MATERIAL_EXAMPLES.get(comp.lower(), "Reinforced concrete; Stone; Mud block").split("; ")
-        body = "\n".join(f"{i + 1}. {option}" for i, option in enumerate(material_options))
-        q = f"Select material for {comp}:\n{body}\n(Reply with the number)"
-        state["slots"]["__expected_choices__"] = (s, material_options)
-    elif s in SPECIAL_SLOT_EXAMPLES:
-        label = s.replace("_", " ")
-        q = f"Enter {label} ({SPECIAL_SLOT_EXAMPLES[s]}):"
+    choice = CHOICE_PROMPTS.get(s)
+    if choice is not None:
+        q, options = choice
+        state.slots["__expected_choices__"] = (s, options)
     elif s == "section_dimensions":
-        idx = state["slots"].get("section_index", 0)
-        cat = state["slots"].get("building_category")
+        idx = state.slots.get("section_index", 0)
+        cat = state.slots.get("building_category")
 
         if cat == "Apartment / Condominium":
             q = f"Enter area of section {idx + 1} in sqm (e.g., 50):"
         else:
-            if state["slots"].get("awaiting_width", False):
+            if state.slots.get("awaiting_width", False):
                 q = f"Enter width of section {idx + 1} in meters (e.g., 5):"
             else:
                 q = f"Enter length of section {idx + 1} in meters (e.g., 10):"
-    elif s in label_map:
-        label = label_map[s]
-        ex = generic_examples.get(s)
-        if s in {"has_basement", "is_under_construction", "has_elevator"}:
-            q = f"{label} (yes/no)"
-        else:
-            q = f"Enter {label}{f' ({ex})' if ex else ''}:"
     else:
-        q = f"Please provide the value for: {s}"
+        q = SLOT_QUESTIONS.get(s) or f"Please provide the value for: {s}"
 
-    state["messages"].append({"role": "assistant", "content": q})
-    state.setdefault("asked", []).append(s)
+    if state.retry_hint:
+        q = f"{state.retry_hint} {q}"
+        state.retry_hint = None
+    state.messages.append({"role": "assistant", "content": q})
+    _mark_asked(state, s)
     return state
 
 
@@ -419,131 +578,145 @@ def ask_next_question_node(state: ValuationState) -> ValuationState:
 # 6) Info extraction node
 # ------------------------------
 def extract_info_node(state: ValuationState) -> ValuationState:
-    if not state.get("messages"):
+    if not state.messages:
         return state
-    last = state["messages"][-1]
+    last = state.messages[-1]
     if last.get("role") != "user":
         return state
 
-    asked_slots = state.get("asked", [])
+    asked_slots = state.asked
     if not asked_slots:
         return state
     last_asked = asked_slots[-1]
+    # Normalise the reply once; branches pick the form they need
     content = last.get("content", "").strip()
+    lowered = content.lower()
 
-    if last_asked in {"has_basement", "has_elevator", "is_under_construction"}:
-        b = _boolify(content)
+    if last_asked in BOOLEAN_SLOTS:
+        b = _boolify(lowered)
         if b is not None:
-            state["slots"][last_asked] = b
+            state.slots[last_asked] = b
         else:
-            state["messages"].append(
+            state.messages.append(
                 {"role": "assistant", "content": "I couldn't understand that. Please reply with 'yes' or 'no'."})
         return state
 
-    expected = state["slots"].get("__expected_choices__")
+    if last_asked in NUMERIC_SLOTS:
+        try:
+            state.slots[last_asked] = _parse_number(NUMERIC_SLOTS[last_asked], content)
+        except ValueError:
+            state.retry_hint = "Please enter a valid number."
+            # Un-mark the slot so the same question is asked again
+            _unmark_asked(state, last_asked)
+        return state
+
+    expected = state.slots.get("__expected_choices__")
     if expected:
         slot, choices = expected
         if content.isdigit():
             idx = int(content) - 1
             if 0 <= idx < len(choices):
-                state["slots"][slot] = choices[idx]
-                state["slots"].pop("__expected_choices__", None)
+                state.slots[slot] = choices[idx]
+                state.slots.pop("__expected_choices__", None)
             else:
-                state["messages"].append(
-                    {"role": "assistant", "content": f"Please select a number between 1 and {len(choices)}."})
+                state.retry_hint = f"Please select a number between 1 and {len(choices)}."
         else:
-            state["messages"].append(
-                {"role": "assistant", "content": "Please enter a valid number corresponding to your choice."})
+            # Accept the option typed out in full (case-insensitive)
+            match = _choice_index(choices).get(lowered)
+            if match is not None:
+                state.slots[slot] = match
+                state.slots.pop("__expected_choices__", None)
+            else:
+                state.retry_hint = "Please enter a valid number corresponding to your choice."
+        if slot not in state.slots:
+            # Un-mark the slot so the same menu is shown again
+            _unmark_asked(state, slot)
         return state
 
     if last_asked == "building_category":
         # Handle the selected category
         if content.isdigit() and 0 < int(content) <= len(VALID_CATEGORIES):
             selected_category = VALID_CATEGORIES[int(content) - 1]
-            state["slots"][last_asked] = selected_category
+            state.slots[last_asked] = selected_category
             
             # For Apartment/Condominium, set default values for sections
             if selected_category == "Apartment / Condominium":
-                state["slots"]["num_sections"] = "1"
-                state["slots"]["section_dimensions"] = [{"area": "100"}]
+                state.slots["num_sections"] = "1"
+                state.slots["section_dimensions"] = [{"area": "100"}]
                 # Mark these as asked so they're skipped
-                state.setdefault("asked", []).extend(["num_sections", "section_dimensions"])
+                _mark_asked(state, "num_sections", "section_dimensions")
         else:
-            state["messages"].append({"role": "assistant", "content": "Please select a valid number from the list."})
+            state.messages.append({"role": "assistant", "content": "Please select a valid number from the list."})
         return state
 
     if last_asked == "num_sections":
         # Initialize section collection
         try:
-            n = int(content)
-            state["slots"]["num_sections"] = n
-            state["slots"]["section_index"] = 0
-            state["slots"]["awaiting_width"] = False
+            n = _parse_number(int, content)
+            state.slots["num_sections"] = n
+            state.slots["section_index"] = 0
+            state.slots["awaiting_width"] = False
         except ValueError:
-            state["messages"].append({"role": "assistant", "content": "Please enter a valid integer for number of sections."})
+            state.retry_hint = "Please enter a valid integer for number of sections."
+            _unmark_asked(state, "num_sections")
         return state
 
     if last_asked == "section_dimensions":
-        idx = state["slots"].get("section_index", 0)
-        cat = state["slots"].get("building_category")
+        idx = state.slots.get("section_index", 0)
+        cat = state.slots.get("building_category")
 
         # Initialize section_dimensions if it doesn't exist
-        if "section_dimensions" not in state["slots"]:
-            state["slots"]["section_dimensions"] = []
+        if "section_dimensions" not in state.slots:
+            state.slots["section_dimensions"] = []
 
         if cat == "Apartment / Condominium":
-            try:
-                area = float(content)
-                while len(state["slots"]["section_dimensions"]) <= idx:
-                    state["slots"]["section_dimensions"].append({})
-                state["slots"]["section_dimensions"][idx]["area"] = area
-                state["slots"]["section_index"] += 1
-
-                num_sections = int(state["slots"].get("num_sections", 1))
-                if state["slots"]["section_index"] >= num_sections:
-                    state["slots"].pop("section_index", None)
-                    state["slots"].pop("awaiting_width", None)
-                    if "section_dimensions" not in state["asked"]:
-                        state["asked"].append("section_dimensions")
-                return state
-            except ValueError:
-                state["messages"].append({"role": "assistant", "content": "Please enter a valid number for the area."})
+            area = _try_float(content)
+            if area is None:
+                state.retry_hint = "Please enter a valid number for the area."
                 return state
+            while len(state.slots["section_dimensions"]) <= idx:
+                state.slots["section_dimensions"].append({})
+            state.slots["section_dimensions"][idx]["area"] = area
+            state.slots["section_index"] += 1
+
+            num_sections = int(state.slots.get("num_sections", 1))
+            if state.slots["section_index"] >= num_sections:
+                state.slots.pop("section_index", None)
+                state.slots.pop("awaiting_width", None)
+                if "section_dimensions" not in state.asked_set:
+                    _mark_asked(state, "section_dimensions")
+            return state
         else:
-            if state["slots"].get("awaiting_width", False):
-                try:
-                    width = float(content)
-                    while len(state["slots"]["section_dimensions"]) <= idx:
-                        state["slots"]["section_dimensions"].append({})
-                    state["slots"]["section_dimensions"][idx]["width"] = width
-                    state["slots"]["section_index"] += 1
-                    state["slots"]["awaiting_width"] = False
-
-                    num_sections = int(state["slots"].get("num_sections", 1))
-                    if state["slots"]["section_index"] >= num_sections:
-                        state["slots"].pop("section_index", None)
-                        state["slots"].pop("awaiting_width", None)
-                        if "section_dimensions" not in state["asked"]:
-                            state["asked"].append("section_dimensions")
-                    return state
-                except ValueError:
-                    state["messages"].append(
-                        {"role": "assistant", "content": "Please enter a valid number for the width."})
+            if state.slots.get("awaiting_width", False):
+                width = _try_float(content)
+                if width is None:
+                    state.retry_hint = "Please enter a valid number for the width."
                     return state
+                while len(state.slots["section_dimensions"]) <= idx:
+                    state.slots["section_dimensions"].append({})
+                state.slots["section_dimensions"][idx]["width"] = width
+                state.slots["section_index"] += 1
+                state.slots["awaiting_width"] = False
+
+                num_sections = int(state.slots.get("num_sections", 1))
+                if state.slots["section_index"] >= num_sections:
+                    state.slots.pop("section_index", None)
+                    state.slots.pop("awaiting_width", None)
+                    if "section_dimensions" not in state.asked_set:
+                        _mark_asked(state, "section_dimensions")
+                return state
             else:
-                try:
-                    length = float(content)
-                    while len(state["slots"]["section_dimensions"]) <= idx:
-                        state["slots"]["section_dimensions"].append({})
-                    state["slots"]["section_dimensions"][idx]["length"] = length
-                    state["slots"]["awaiting_width"] = True
-                    return state
-                except ValueError:
-                    state["messages"].append(
-                        {"role": "assistant", "content": "Please enter a valid number for the length."})
+                length = _try_float(content)
+                if length is None:
+                    state.retry_hint = "Please enter a valid number for the length."
                     return state
+                while len(state.slots["section_dimensions"]) <= idx:
+                    state.slots["section_dimensions"].append({})
+                state.slots["section_dimensions"][idx]["length"] = length
+                state.slots["awaiting_width"] = True
+                return state
 
-    state["slots"][last_asked] = content
+    state.slots[last_asked] = content
     return state
 
 
@@ -553,8 +726,8 @@ def extract_info_node(state: ValuationState) -> ValuationState:
 def summary_confirmation_node(state: ValuationState) -> ValuationState:
     import streamlit as st
     
-    slots = state.get("slots", {})
-    messages = state.get("messages", [])
+    slots = state.slots
+    messages = state.messages
     category = slots.get("building_category", "")
     building_name = slots.get("building_name", "Unnamed Property")
     
@@ -562,7 +735,7 @@ def summary_confirmation_node(state: ValuationState) -> ValuationState:
     property_details = [
         ("Location", slots.get('prop_town', 'Not specified')),
         ("Property Use", slots.get('gen_use', 'Not specified')),
-        ("Plot Area", f"{slots.get('plot_area_sqm', '0')} sqm"),
+        ("Plot Area", f"{_format_number(slots.get('plot_area_sqm', '0'))} sqm"),
         ("Category", category)
     ]
     
@@ -572,17 +745,17 @@ def summary_confirmation_node(state: ValuationState) -> ValuationState:
         special_params = CATEGORY_SPECIAL_SLOTS.get(category, [])
         for param in special_params:
             if param in slots:
-                detailed_info.append((param.replace('_', ' ').title(), str(slots[param])))
+                detailed_info.append((param.replace('_', ' ').title(), _format_number(slots[param])))
     else:
         if slots.get("section_dimensions"):
             for i, sec in enumerate(slots["section_dimensions"], 1):
                 if "length" in sec and "width" in sec:
-                    detailed_info.append((f"Section {i} Dimensions", f"{sec['length']}m × {sec['width']}m"))
+                    detailed_info.append((f"Section {i} Dimensions", f"{_format_number(sec['length'])}m × {_format_number(sec['width'])}m"))
                 elif "area" in sec:
-                    detailed_info.append((f"Section {i} Area", f"{sec['area']} sqm"))
+                    detailed_info.append((f"Section {i} Area", f"{_format_number(sec['area'])} sqm"))
         
         if "num_floors" in slots:
-            detailed_info.append(("Number of Floors", slots['num_floors']))
+            detailed_info.append(("Number of Floors", _format_number(slots['num_floors'])))
         if "has_elevator" in slots:
             detailed_info.append(("Has Elevator", 'Yes' if slots['has_elevator'] else 'No'))
         if "has_basement" in slots:
@@ -601,9 +774,7 @@ def summary_confirmation_node(state: ValuationState) -> ValuationState:
     """
     
     # Add property details
-    all_details = property_details + detailed_info
-    for label, value in all_details:
-        message += f"- {label}: {value}\n"
+    message += "".join(f"- {label}: {value}\n" for label, value in property_details + detailed_info)
     
     # Add confirmation prompt
     message += """
@@ -615,20 +786,25 @@ def summary_confirmation_node(state: ValuationState) -> ValuationState:
     
     # Add the message to the chat
     messages.append({"role": "assistant", "content": message})
-    state.setdefault("asked", []).append("_confirmation")
+    _mark_asked(state, "_confirmation")
     return state
 
 
+# Replies accepted at the summary confirmation step
+_CONFIRM_LITERALS = frozenset({"yes", "y", "proceed", "confirm"})
+_CANCEL_LITERALS = frozenset({"no", "n", "cancel", "stop"})
+
+
 def process_confirmation_node(state: ValuationState) -> ValuationState:
-    slots = state.get("slots", {})
-    messages = state.get("messages", [])
+    slots = state.slots
+    messages = state.messages
     if not messages:
         return state
     user_response = messages[-1]["content"].strip().lower()
-    if user_response in {"yes", "y", "proceed", "confirm"}:
+    if user_response in _CONFIRM_LITERALS:
         slots["_confirmed"] = True
         messages.append({"role": "assistant", "content": "✅ Proceeding with valuation..."})
-    elif user_response in {"no", "n", "cancel", "stop"}:
+    elif user_response in _CANCEL_LITERALS:
         messages.append({"role": "assistant", "content": "❌ Valuation cancelled. Type 'quit' or start over."})
         slots["_confirmed"] = False
     else:
@@ -637,18 +813,18 @@ def process_confirmation_node(state: ValuationState) -> ValuationState:
 
 
 def should_calculate(state: ValuationState) -> str:
-    slots = state.get("slots", {})
+    slots = state.slots
+    
+    # Summary shown and awaiting yes/no: go straight to confirmation handling
+    if "_confirmation" in state.asked_set:
+        return "CONFIRM_PENDING"
     
     # If car is selected, don't proceed with valuation
     if slots.get("collateral_type", "").lower() == "car":
         return "ASK"  # This will prevent further processing
     
-    remaining = missing_slots(slots)
-
-    if "section_dimensions" in remaining:
-        return "ASK"
-
-    if remaining:
+    # Only whether anything is missing matters here, so stop at the first gap
+    if next(_iter_missing_slots(slots), None) is not None:
         return "ASK"
     elif not slots.get("_confirmed", False):
         return "CONFIRM"
@@ -659,11 +835,10 @@ def should_calculate(state: ValuationState) -> str:
 # 8) Material / specialized helpers
 # ------------------------------
 def _collect_selected_materials(slots: Dict[str, object], category: str) -> Dict[str, str]:
-    comps = get_material_components_for_category(category)
-    out: Dict[str, str] = {}
-    for c in comps:
-        out[c] = str(slots.get(f"material__{c}", "")).strip()
-    return out
+    return {
+        c: str(slots.get(f"material__{c}", "")).strip()
+        for c in get_material_components_for_category(category)
+    }
 
 
 def _collect_specialized_components(slots: Dict[str, object], category: str) -> Dict[str, float | int]:
@@ -673,10 +848,7 @@ def _collect_specialized_components(slots: Dict[str, object], category: str) ->
         if val is None or val == "":
             continue
         try:
-            if key.startswith("num_"):
-                spec[key] = int(val)
-            else:
-                spec[key] = float(val)
+            spec[key] = _SPECIAL_SLOT_CTOR[key](val)
         except Exception:
             spec[key] = val
 
@@ -702,24 +874,43 @@ def _collect_specialized_components(slots: Dict[str, object], category: str) ->
     return spec
 
 
+def _parse_area_range(range_str: str) -> Tuple[float, float]:
+    start_str, end_str = range_str.split("-")
+    end = math.inf if end_str.lower() == "inf" else float(end_str)
+    return float(start_str), end
+
+
+def _build_plot_grade_index() -> Dict[Tuple[str, str], List[Tuple[str, array, array]]]:
+    # (location, use) -> [(grade, sorted range starts, matching range ends), ...] in grade order
+    index = {}
+    for location, uses in PLOT_PRICES.items():
+        for use_type, grades in uses.items():
+            table = []
+            for grade, ranges in grades.items():
+                bounds = sorted(_parse_area_range(r) for r in ranges)
+                table.append((grade, array("d", (start for start, _ in bounds)), array("d", (end for _, end in bounds))))
+            index[(location, use_type)] = table
+    return index
+
+
+_PLOT_GRADE_INDEX = _build_plot_grade_index()
+
+
 def select_plot_grade(location: str, use_type: str, plot_area: float) -> str:
-    try:
-        town_data = PLOT_PRICES.get(location, {})
-        use_data = town_data.get(use_type, {})
-        for grade, ranges in use_data.items():
-            for range_str in ranges.keys():
-                start_str, end_str = range_str.split("-")
-                start = float(start_str)
-                end = float("inf") if end_str.lower() == "inf" else float(end_str)
-                if start <= plot_area <= end:
-                    return grade
-    except Exception:
-        pass
+    for grade, starts, ends in _PLOT_GRADE_INDEX.get((location, use_type), ()):
+        i = bisect.bisect_right(starts, plot_area) - 1
+        if i >= 0 and plot_area <= ends[i]:
+            return grade
     return "Average"
 
 
+# Patterns for reading the tool's formatted report
+_MARKET_VALUE_RE = re.compile(r'Estimated Market Value.*?ETB\s*([\d,]+(?:\.[\d]+)?)')
+_FORCED_VALUE_RE = re.compile(r'Estimated Forced Sale Value.*?ETB\s*([\d,]+(?:\.[\d]+)?)')
+
+
 def calculate_node(state: ValuationState) -> ValuationState:
-    slots = state.get("slots", {})
+    slots = state.slots
     category = slots.get("building_category")
 
     # Set default values for Apartment/Condominium if not already set
@@ -758,7 +949,7 @@ def calculate_node(state: ValuationState) -> ValuationState:
     }
 
     # For special categories, ensure we have the required fields
-    if category in ["Fuel Station", "Coffee Washing Site", "Green House"]:
+    if category in SPECIAL_CATEGORIES:
         # Add any additional required fields for special categories
         if category == "Fuel Station":
             building.update({
@@ -823,29 +1014,18 @@ def calculate_node(state: ValuationState) -> ValuationState:
         # The tool returns a formatted string, not JSON
         result_text = property_valuation_tool.invoke(payload)
         
-        # Extract building name or use a default
-        building_name = slots.get('building_name', 'the property')
-        
         # Extract valuation amounts
-        import re
         valuation_amount = "[Calculating...]"
         market_value = "[Not available]"
         
-        market_value_match = re.search(r'Estimated Market Value.*?ETB\s*([\d,]+(?:\.[\d]+)?)', result_text)
-        forced_value_match = re.search(r'Estimated Forced Sale Value.*?ETB\s*([\d,]+(?:\.[\d]+)?)', result_text)
+        market_value_match = _MARKET_VALUE_RE.search(result_text)
+        forced_value_match = _FORCED_VALUE_RE.search(result_text)
         
         if market_value_match:
             market_value = f"ETB {market_value_match.group(1)}"
         if forced_value_match:
             valuation_amount = f"ETB {forced_value_match.group(1)}"
             
-        # Clean up the result text
-        clean_result = re.sub(r'<[^>]+>', '', result_text)
-        clean_result = ' '.join(clean_result.split())
-        
-        # Get materials used
-        materials = _collect_selected_materials(slots, category)
-        
         # Create a summary with property details and valuation (without markdown)
         summary_text = f"""
 PROPERTY DETAILS
@@ -861,7 +1041,7 @@ Forced Sale Value (70% of Market Value): {valuation_amount}
 """
         
         # Add the final summary message
-        state["messages"].append({
+        state.messages.append({
             "role": "assistant",
             "content": summary_text
         })
@@ -875,9 +1055,9 @@ Forced Sale Value (70% of Market Value): {valuation_amount}
             "",
             "Please check the input data and try again. If the problem persists, contact support."
         ]
-        state["messages"].append({"role": "assistant", "content": "\n".join(error_message)})
+        state.messages.append({"role": "assistant", "content": "\n".join(error_message)})
         summary_text = "\n".join(error_message)
-    state["messages"].append({"role": "assistant", "content": summary_text})
+    state.messages.append({"role": "assistant", "content": summary_text})
     return state
 # ------------------------------
 # 8) CLI Runner (simplified)
@@ -887,7 +1067,7 @@ if __name__ == "__main__":
     print("Type 'quit' to exit.\n")
     state: ValuationState = initial_state()
     state = ask_next_question_node(state)
-    print("Bot:", state["messages"][-1]["content"], "\n")
+    print("Bot:", state.messages[-1]["content"], "\n")
 
     while True:
         user = input("You: ")
@@ -895,17 +1075,34 @@ if __name__ == "__main__":
             print("👋 Goodbye!")
             break
 
-        state["messages"].append({"role": "user", "content": user})
-        state = extract_info_node(state)
+        state.messages.append({"role": "user", "content": user})
+
+        if should_calculate(state) == "CONFIRM_PENDING":
+            # Reply to the summary: no slot extraction needed
+            state = process_confirmation_node(state)
+            slots = state.slots
+            if slots.get("_confirmed", False):
+                state = calculate_node(state)
+                reset_asked(state)
+                slots["_confirmed"] = False
+            elif slots.get("_confirmed") == False:
+                # Reset and start over
+                reset_asked(state)
+                slots["_confirmed"] = None
+                if missing_slots(slots):
+                    state = ask_next_question_node(state)
+        else:
+            state = extract_info_node(state)
 
-        # Determine the next step based on the updated state
-        next_step = should_calculate(state)
+            # Determine the next step based on the updated state
+            next_step = should_calculate(state)
 
-        if next_step == "ASK":
-            state = ask_next_question_node(state)
-        elif next_step == "CONFIRM":
-            state = summary_confirmation_node(state)
-        elif next_step == "CALC":
-            state = calculate_node(state)
+            if next_step == "ASK":
+                state = ask_next_question_node(state)
+            elif next_step == "CONFIRM":
+                state = summary_confirmation_node(state)
+            elif next_step == "CALC":
+                state = calculate_node(state)
+                reset_asked(state)
 
-        print("Bot:", state["messages"][-1]["content"], "\n")
\ No newline at end of file
+        print("Bot:", state.messages[-1]["content"], "\n")
\ No newline at end of file
@@ -0,0 +1,117 @@
+# test_agent.py
+
+from core.agent import (
+    CHOICE_PROMPTS, initial_state, extract_info_node,
+    ask_next_question_node, should_calculate
+)
+
+def reply(state, text):
+    """Feed one user reply through the agent the way app.py does for questions"""
+    state.messages.append({"role": "user", "content": text})
+    state = extract_info_node(state)
+    if should_calculate(state) == "ASK":
+        state = ask_next_question_node(state)
+    return state
+
+def start(*replies):
+    """Start a House conversation and answer the given replies"""
+    state = ask_next_question_node(initial_state())
+    for text in ("House",) + replies:
+        state = reply(state, text)
+    return state
+
+def last_message(state):
+    return state.messages[-1]["content"]
+
+def test_numeric_replies():
+    """Numeric slots coerce plain and embedded numbers"""
+    print("Running numeric reply tests...")
+    for text, expected in [("450", 450.0), ("450 sqm", 450.0), ("1,200", 1200.0), ("about 1,200.5", 1200.5)]:
+        state = start("2", "1", "1", text)
+        assert state.slots["plot_area_sqm"] == expected, (text, state.slots.get("plot_area_sqm"))
+        assert "number of floors" in last_message(state)
+
+    state = start("2", "1", "1", "450", "2 floors")
+    assert state.slots["num_floors"] == 2 and isinstance(state.slots["num_floors"], int)
+
+def test_invalid_numbers_are_asked_again():
+    """Negative, non-finite and ambiguous numbers re-ask the slot with a visible hint"""
+    print("Running invalid number tests...")
+    for text in ["abc", "-20 sqm", "-5", "nan", "inf", "between 100 and 200", "1,0", "1,5", "1,2345"]:
+        state = start("2", "1", "1", text)
+        assert "plot_area_sqm" not in state.slots, (text, state.slots.get("plot_area_sqm"))
+        assert last_message(state) == "Please enter a valid number. Enter plot area (sqm) (e.g., 450):", text
+        assert state.asked[-1] == "plot_area_sqm"
+
+        # The re-asked question accepts a valid answer and moves on
+        state = reply(state, "450")
+        assert state.slots["plot_area_sqm"] == 450.0
+        assert "number of floors" in last_message(state)
+
+    state = start("2", "1", "1", "450", "3.5")
+    assert "num_floors" not in state.slots
+    assert last_message(state).startswith("Please enter a valid number.")
+
+def test_leading_dot_decimal():
+    """A decimal without a leading digit keeps its value"""
+    print("Running leading-dot decimal tests...")
+    state = start("2", "1", "1", "450", "1", "no", "no", "no", "about .9")
+    assert state.slots["mcf"] == 0.9, state.slots.get("mcf")
+
+def test_choice_replies():
+    """Numbered choices accept the number or the option typed out in full"""
+    print("Running choice reply tests...")
+    towns = CHOICE_PROMPTS["prop_town"][1]
+
+    state = start("1", "2")
+    assert state.slots["prop_town"] == towns[1]
+
+    state = start("1", towns[2].upper())
+    assert state.slots["prop_town"] == towns[2]
+
+    # Invalid replies show the same menu again with the hint in front
+    state = start("1", str(len(towns) + 1))
+    assert "prop_town" not in state.slots
+    assert last_message(state).startswith(f"Please select a number between 1 and {len(towns)}. Please select prop town:")
+
+    state = reply(state, "somewhere else")
+    assert last_message(state).startswith("Please enter a valid number corresponding to your choice. Please select prop town:")
+
+    state = reply(state, "1")
+    assert state.slots["prop_town"] == towns[0]
+    assert "gen use" in last_message(state)
+
+def test_section_dimensions():
+    """Section counts and dimensions go through the same bounds as numeric slots"""
+    print("Running section dimension tests...")
+    state = start("2", "1", "1", "800", "2", "no", "no", "no", "1.0", "1.0")
+    assert "How many sections" in last_message(state)
+
+    state = reply(state, "-2")
+    assert "num_sections" not in state.slots
+    assert last_message(state).startswith("Please enter a valid integer for number of sections.")
+
+    state = reply(state, "1")
+    assert last_message(state) == "Enter length of section 1 in meters (e.g., 10):"
+
+    for text in ["-3 m", "nan", "1,5"]:
+        state = reply(state, text)
+        assert last_message(state) == (
+            "Please enter a valid number for the length. Enter length of section 1 in meters (e.g., 10):"), text
+
+    state = reply(state, ".5 m")
+    assert state.slots["section_dimensions"][0]["length"] == 0.5
+
+    state = reply(state, "-1")
+    assert last_message(state).startswith("Please enter a valid number for the width.")
+    state = reply(state, "5")
+    assert state.slots["section_dimensions"] == [{"length": 0.5, "width": 5.0}]
+
+# Run the tests
+if __name__ == "__main__":
+    test_numeric_replies()
+    test_invalid_numbers_are_asked_again()
+    test_leading_dot_decimal()
+    test_choice_replies()
+    test_section_dimensions()
+    print("\n--- ALL AGENT TESTS PASSED ---\n")